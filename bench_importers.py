@@ -0,0 +1,471 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.13"
+# dependencies = []
+# ///
+import argparse
+import datetime
+import fake_places
+import http.server
+import json
+import logging
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+
+
+SCRIPT_DIR = pathlib.Path(__file__).resolve().parent
+
+# Synthetic histories end in this year, and upstream sources report the next one.
+LAST_YEAR = 2025
+
+# FanCons lists every series, but like a real run only a few of them have a new event
+# and the rest re-list their latest one. New events are geocoded, and a fixed number of
+# them keeps the Google Maps client's rate limiter out of the scaling curves.
+FANCONS_NEW_EVENTS = 10
+
+IMPORTERS = ["fancons", "concat", "eventdrake", "regfox", "rams"]
+
+# Importer settings that would change what is measured, or make a run write outside
+# its dataset, if they leaked in from the caller's environment.
+STRIPPED_ENV = {
+    "ARCHIVE_URL",
+    "BACKFILL_BATCH_SIZE",
+    "BACKFILL_CHECKPOINT",
+    "BACKFILL_CONCURRENCY",
+    "BACKFILL_YEARS",
+    "CHANGE_FEED",
+    "FANCONS_ALIASES",
+    "OUTPUT_DIR",
+    "PROFILE_DIR",
+    "PROFILE_INTERVAL",
+    "RECORD_DIR",
+    "REPLAY_DIR",
+    "SERIES_DB",
+    "VENUE_REUSE_RADIUS_KM",
+}
+
+
+def series_id_for(n: int) -> str:
+    return f"synthetic-con-{n}"
+
+
+def generate_dataset(path: pathlib.Path, series_count: int, events_per_series: int):
+    """Writes series files shaped like the real dataset.
+
+    Every series has one event per year ending in LAST_YEAR at a fixed venue.
+    """
+    rng = random.Random(0)
+    os.makedirs(path / "import_pending", exist_ok=True)
+
+    for n in range(series_count):
+        series_id = series_id_for(n)
+        lat_lng = [round(rng.uniform(-60, 60), 7), round(rng.uniform(-180, 180), 7)]
+        month = rng.randint(1, 12)
+        day = rng.randint(1, 25)
+        length = rng.randint(0, 3)
+
+        events = []
+        for year in range(LAST_YEAR, LAST_YEAR - events_per_series, -1):
+            start_date = datetime.date(year, month, day)
+            events.append(
+                {
+                    "id": f"{series_id}-{year}",
+                    "name": f"Synthetic Con {n} {year}",
+                    "url": f"https://synthetic-con-{n}.example",
+                    "startDate": start_date.isoformat(),
+                    "endDate": (
+                        start_date + datetime.timedelta(days=length)
+                    ).isoformat(),
+                    "venue": f"Convention Center {n}",
+                    "address": f"{n} Main St, Springfield, United States",
+                    "locale": "en-US",
+                    "latLng": lat_lng,
+                }
+            )
+
+        with open(path / f"{series_id}.json", "w") as f:
+            json.dump(
+                {"name": f"Synthetic Con {n}", "events": events},
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+            f.write("\n")
+
+
+def next_event_dates(
+    path: pathlib.Path, n: int, year: int = LAST_YEAR + 1
+) -> tuple[datetime.date, datetime.date]:
+    with open(path / f"{series_id_for(n)}.json") as f:
+        (latest, *_) = json.load(f)["events"]
+    start_date = datetime.date.fromisoformat(latest["startDate"])
+    end_date = datetime.date.fromisoformat(latest["endDate"])
+    return start_date.replace(year=year), end_date.replace(year=year)
+
+
+class Upstream:
+    """Serves synthetic responses in place of every importer's upstream source."""
+
+    def __init__(self):
+        self.routes = {}
+        self.server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        routes = self.routes
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def respond(self):
+                route = routes.get((self.command, self.path))
+                if route is None:
+                    self.send_error(404)
+                    return
+                content_type, body = route
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.respond()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.respond()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add(self, path: str, content_type: str, body: str, method: str = "GET"):
+        self.routes[(method, path)] = (content_type, body.encode("utf-8"))
+
+    def add_json(self, path: str, body, method: str = "GET"):
+        self.add(path, "application/json", json.dumps(body), method)
+
+
+def serve_fancons(upstream: Upstream, path: pathlib.Path, series_count: int):
+    entries = []
+    markers = []
+    for n in range(series_count):
+        start_date, end_date = next_event_dates(
+            path,
+            n,
+            LAST_YEAR + 1 if n < FANCONS_NEW_EVENTS else LAST_YEAR,
+        )
+        entries.append(
+            {
+                "@context": "http://schema.org",
+                "@type": "Event",
+                "name": f"Synthetic Con {n} {start_date.year}",
+                "url": f"https://furrycons.com/calendar/event/{n}/",
+                "startDate": start_date.isoformat(),
+                "endDate": end_date.isoformat(),
+                "eventStatus": "https://schema.org/EventScheduled",
+                "location": {
+                    "name": f"Convention Center {n}",
+                    "address": {
+                        "addressLocality": "Springfield",
+                        "addressCountry": "United States",
+                    },
+                },
+            }
+        )
+        markers.append(f'<marker id="{n}" lat="{n % 90}" lng="{n % 180}"/>')
+
+    upstream.add(
+        "/fancons/calendar.php",
+        "text/html",
+        '<html><script type="application/ld+json">'
+        f"{json.dumps(entries)}</script></html>",
+    )
+    upstream.add(
+        "/fancons/map.xml", "text/xml", f"<markers>{''.join(markers)}</markers>"
+    )
+
+
+def serve_concat(upstream: Upstream, path: pathlib.Path):
+    start_date, end_date = next_event_dates(path, 0)
+    upstream.add_json(
+        "/concat/api/config",
+        {
+            "organization": {"country": "US"},
+            "conventions": [
+                {
+                    "domain": upstream.base_url.removeprefix("http://"),
+                    "longName": f"Synthetic Con 0 {start_date.year}",
+                    "startAt": f"{start_date.isoformat()}T10:00:00-05:00",
+                    "endAt": f"{end_date.isoformat()}T18:00:00-05:00",
+                    "venue": "Convention Center 0",
+                }
+            ],
+        },
+    )
+
+
+def serve_eventdrake(upstream: Upstream, path: pathlib.Path):
+    start_date, end_date = next_event_dates(path, 0)
+    upstream.add_json(
+        "/eventdrake/_config/system.json",
+        {
+            "graphql": {
+                "endpoint": f"{upstream.base_url}/eventdrake/graphql",
+                "api_key": "bench",
+            }
+        },
+    )
+    upstream.add_json(
+        "/eventdrake/graphql",
+        {
+            "data": {
+                "listAllEvents": {
+                    "items": [
+                        {
+                            "id": "synthetic",
+                            "visible": True,
+                            "enabled": True,
+                            "title": f"Synthetic Con 0 {start_date.year}",
+                            "title_short": "Synthetic Con",
+                            "date_event_start": int(
+                                datetime.datetime.combine(
+                                    start_date, datetime.time(12), datetime.UTC
+                                ).timestamp()
+                            ),
+                            "date_event_end": int(
+                                datetime.datetime.combine(
+                                    end_date, datetime.time(12), datetime.UTC
+                                ).timestamp()
+                            ),
+                            "url_key": f"synthetic{start_date.year}",
+                        }
+                    ],
+                    "nextToken": None,
+                }
+            }
+        },
+        method="POST",
+    )
+    upstream.add_json(
+        "/eventdrake/_config/app/synthetic.json",
+        {"core": {"locale": {"timezone": "UTC"}}},
+    )
+
+
+def serve_regfox(upstream: Upstream, path: pathlib.Path):
+    start_date, end_date = next_event_dates(path, 0)
+    app_settings = {
+        "calendarInfo": {
+            "date": f"{start_date.isoformat()}T10:00:00-05:00",
+            "endDate": f"{end_date.isoformat()}T18:00:00-05:00",
+        }
+    }
+    upstream.add(
+        "/regfox",
+        "text/html",
+        "<html><script>window.__BOOTSTRAP__ = "
+        f"{json.dumps({'appSettings': json.dumps(app_settings)})};</script></html>",
+    )
+
+
+def serve_rams(upstream: Upstream, path: pathlib.Path):
+    start_date, end_date = next_event_dates(path, 0)
+    upstream.add(
+        "/rams/landing/index",
+        "text/html",
+        '<html><h1 class="landing-title">'
+        f"Synthetic Con 0 {start_date.year} Registration</h1>"
+        f"<p>{start_date.strftime('%B')} {start_date.day} - "
+        f"{end_date.strftime('%B')} {end_date.day}</p></html>",
+    )
+
+
+# Runs a command and writes its wall time and peak RSS to a file. A forked child starts
+# out with its parent's peak RSS, so the importer has to be started from a process
+# smaller than it rather than from the benchmark itself.
+MEASURE = """
+import os, subprocess, sys, time
+start = time.perf_counter()
+proc = subprocess.Popen(sys.argv[2:])
+_, status, rusage = os.wait4(proc.pid, 0)
+with open(sys.argv[1], "w") as f:
+    f.write(f"{time.perf_counter() - start} {rusage.ru_maxrss}")
+sys.exit(os.waitstatus_to_exitcode(status))
+"""
+
+
+def run_importer(
+    importer: str,
+    path: pathlib.Path,
+    series_count: int,
+    upstream: Upstream,
+    places_url: str,
+    python: str | None,
+) -> tuple[float, int]:
+    """Runs one importer against the dataset at path.
+
+    Returns its wall time in seconds and peak RSS in bytes.
+    """
+    fn = f"{series_id_for(0)}.json"
+    base_url = upstream.base_url
+    match importer:
+        case "fancons":
+            serve_fancons(upstream, path, series_count)
+            args = []
+        case "concat":
+            serve_concat(upstream, path)
+            args = [fn, f"{base_url}/concat"]
+        case "eventdrake":
+            serve_eventdrake(upstream, path)
+            args = [fn, f"{base_url}/eventdrake", "synthetic"]
+        case "regfox":
+            serve_regfox(upstream, path)
+            args = [fn, f"{base_url}/regfox"]
+        case "rams":
+            serve_rams(upstream, path)
+            args = [fn, f"{base_url}/rams"]
+
+    script = str(SCRIPT_DIR / f"import_{importer}.py")
+    cmd = [python, script, *args] if python is not None else [script, *args]
+
+    env = {k: v for k, v in os.environ.items() if k not in STRIPPED_ENV}
+    env.update(
+        {
+            # Otherwise the helper modules get bytecode cached next to the scripts.
+            "PYTHONDONTWRITEBYTECODE": "1",
+            "CALENDAR_URL": f"{base_url}/fancons/calendar.php",
+            "MAP_URL": f"{base_url}/fancons/map.xml",
+            "GOOGLE_MAPS_BASE_URL": places_url,
+            "GOOGLE_MAPS_API_KEY": "AIzaFake",
+        }
+    )
+
+    with tempfile.TemporaryFile() as log, tempfile.NamedTemporaryFile() as result:
+        try:
+            subprocess.run(
+                [sys.executable, "-c", MEASURE, result.name, *cmd],
+                cwd=path,
+                env=env,
+                stdout=log,
+                stderr=log,
+                check=True,
+            )
+        except subprocess.CalledProcessError:
+            log.seek(0)
+            sys.stderr.buffer.write(log.read())
+            raise
+
+        elapsed, max_rss = result.read().split()
+
+    # ru_maxrss is in kilobytes on Linux.
+    return float(elapsed), int(max_rss) * 1024
+
+
+def parse_counts(s: str) -> list[int]:
+    return [int(part) for part in s.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark importers against synthetic datasets of varying size."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser(
+        "generate", help="write a synthetic dataset"
+    )
+    generate_parser.add_argument("path", type=pathlib.Path)
+    generate_parser.add_argument("--series", type=int, default=10000)
+    generate_parser.add_argument("--events", type=int, default=30)
+
+    run_parser = subparsers.add_parser(
+        "run", help="time importers over a grid of dataset sizes"
+    )
+    run_parser.add_argument(
+        "--series",
+        type=parse_counts,
+        default=[100, 1000, 10000],
+        help="comma-separated series counts",
+    )
+    run_parser.add_argument(
+        "--events",
+        type=parse_counts,
+        default=[1, 10, 30],
+        help="comma-separated events per series",
+    )
+    run_parser.add_argument(
+        "--importers",
+        type=lambda s: s.split(","),
+        default=IMPORTERS,
+        help="comma-separated importers to run",
+    )
+    run_parser.add_argument(
+        "--python",
+        help="run importers with this interpreter instead of their uv shebang",
+    )
+
+    args = parser.parse_args()
+
+    # fake_places logs every request.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.command == "generate":
+        generate_dataset(args.path, args.series, args.events)
+        return
+
+    places = fake_places.make_server("127.0.0.1", 0, 0.0)
+    threading.Thread(target=places.serve_forever, daemon=True).start()
+    host, port = places.server_address
+    places_url = f"http://{host}:{port}"
+
+    print("importer\tseries\tevents\tseconds\tmax_rss_mib", flush=True)
+    try:
+        for importer in args.importers:
+            # Everything but FanCons imports a single series per run, so only the
+            # history length matters for them.
+            series_counts = args.series if importer == "fancons" else [1]
+            for series_count in series_counts:
+                for events_per_series in args.events:
+                    upstream = Upstream()
+                    upstream.start()
+                    try:
+                        with tempfile.TemporaryDirectory() as tmp:
+                            path = pathlib.Path(tmp)
+                            generate_dataset(path, series_count, events_per_series)
+                            elapsed, max_rss = run_importer(
+                                importer,
+                                path,
+                                series_count,
+                                upstream,
+                                places_url,
+                                args.python,
+                            )
+                    finally:
+                        upstream.stop()
+
+                    print(
+                        f"{importer}\t{series_count}\t{events_per_series}\t"
+                        f"{elapsed:.3f}\t{max_rss / 2**20:.1f}",
+                        flush=True,
+                    )
+    finally:
+        places.shutdown()
+
+
+if __name__ == "__main__":
+    main()
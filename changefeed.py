@@ -0,0 +1,67 @@
+import json
+import os
+import typing
+
+
+CHANGE_FEED = os.environ.get("CHANGE_FEED")
+
+
+def _line(
+    source: str,
+    series_id: str,
+    event_id: str,
+    kind: typing.Literal["added", "updated"],
+    old: dict[str, typing.Any] | None,
+    new: dict[str, typing.Any] | None,
+) -> str:
+    line = json.dumps(
+        {
+            "seriesId": series_id,
+            "eventId": event_id,
+            "kind": kind,
+            "old": old,
+            "new": new,
+            "source": source,
+        },
+        ensure_ascii=False,
+    )
+    return f"{line}\n"
+
+
+def _append(lines: str):
+    # A single append, so that importers running in parallel can share one feed.
+    fd = os.open(CHANGE_FEED, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, lines.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+class Pending:
+    """Change records held back until the changes they describe have been saved.
+
+    Records are serialized as they are made, so later edits to the events don't leak
+    into them.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._lines = []
+
+    def record(
+        self,
+        series_id: str,
+        event_id: str,
+        kind: typing.Literal["added", "updated"],
+        old: dict[str, typing.Any] | None,
+        new: dict[str, typing.Any] | None,
+    ):
+        if CHANGE_FEED is None:
+            return
+        self._lines.append(_line(self.source, series_id, event_id, kind, old, new))
+
+    def flush(self):
+        """Appends the held records to CHANGE_FEED. Call after saving."""
+        if self._lines:
+            _append("".join(self._lines))
+        self._lines.clear()
@@ -0,0 +1,181 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.13"
+# dependencies = []
+# ///
+import bisect
+import collections
+import datetime
+import logging
+import os
+import storage
+import typing
+import venues
+
+
+logging.basicConfig(level=logging.INFO)
+
+# Overlapping events at venues this close together are likely the same event, as are
+# ones at similarly named venues within a city's distance (in case either was geocoded
+# imprecisely).
+DUPLICATE_DISTANCE_KM = 1.0
+SIMILAR_VENUE_DISTANCE_KM = 25.0
+
+
+# Longer events are almost certainly bad data. They're kept out of the date-sorted
+# buckets, so that one of them can't widen the window every query has to scan.
+MAX_EVENT_LENGTH = datetime.timedelta(days=14)
+
+
+class EventIndex:
+    """Every event's [startDate, endDate] interval, for finding overlaps.
+
+    Events are bucketed by the grid cell of their venue (events without a location
+    share a bucket), and kept sorted by start date within each bucket. They are also
+    bucketed by venue name, for events without a location. Since no bucketed event
+    lasts longer than MAX_EVENT_LENGTH, everything overlapping an interval starts
+    within a bounded window before it, so a query is two binary searches per bucket
+    checked plus the overlaps found. The few longer events are checked on every query.
+    """
+
+    def __init__(self):
+        self._cells = collections.defaultdict(list)
+        self._names = collections.defaultdict(list)
+        self._long = []
+        self._max_length = datetime.timedelta(0)
+
+    def add(self, series_id: str, event: dict[str, typing.Any]):
+        start_date = datetime.date.fromisoformat(event["startDate"])
+        end_date = datetime.date.fromisoformat(event["endDate"])
+        entry = (start_date, end_date, series_id, event)
+
+        if end_date - start_date > MAX_EVENT_LENGTH:
+            logging.warning(
+                f"{event['id']} lasts {(end_date - start_date).days} days, "
+                "check its dates"
+            )
+            self._long.append(entry)
+            return
+
+        self._max_length = max(self._max_length, end_date - start_date)
+        cell = venues.cell(event["latLng"]) if event.get("latLng") else None
+        bisect.insort(self._cells[cell], entry, key=_start_date)
+        if event.get("venue"):
+            bisect.insort(
+                self._names[venues.normalize_name(event["venue"])],
+                entry,
+                key=_start_date,
+            )
+
+    def _overlapping(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        buckets: typing.Iterable[list],
+    ) -> typing.Iterator[tuple[str, dict[str, typing.Any]]]:
+        for entries in buckets:
+            lo = bisect.bisect_left(
+                entries, start_date - self._max_length, key=_start_date
+            )
+            hi = bisect.bisect_right(entries, end_date, key=_start_date)
+            for _, other_end_date, series_id, event in entries[lo:hi]:
+                if other_end_date >= start_date:
+                    yield series_id, event
+
+        for other_start_date, other_end_date, series_id, event in self._long:
+            if other_start_date <= end_date and other_end_date >= start_date:
+                yield series_id, event
+
+    def likely_duplicates(
+        self, series_id: str, event: dict[str, typing.Any]
+    ) -> typing.Iterator[tuple[str, dict[str, typing.Any]]]:
+        """Events from other series that overlap the event at the same venue.
+
+        Events without a location are only compared to others without one, and to
+        those at a venue of the same name.
+        """
+        if event.get("latLng"):
+            keys = [
+                *venues.cells_near(event["latLng"], SIMILAR_VENUE_DISTANCE_KM),
+                None,
+            ]
+            buckets = [self._cells[key] for key in keys if key in self._cells]
+        else:
+            buckets = [self._cells.get(None, [])]
+            if event.get("venue"):
+                buckets.append(
+                    self._names.get(venues.normalize_name(event["venue"]), [])
+                )
+
+        seen = set()
+        for other_series_id, other in self._overlapping(
+            datetime.date.fromisoformat(event["startDate"]),
+            datetime.date.fromisoformat(event["endDate"]),
+            buckets,
+        ):
+            if other_series_id == series_id or id(other) in seen:
+                continue
+            seen.add(id(other))
+            if is_same_venue(event, other):
+                yield other_series_id, other
+
+    def __iter__(self) -> typing.Iterator[tuple[str, dict[str, typing.Any]]]:
+        for entries in [*self._cells.values(), self._long]:
+            for _, _, series_id, event in entries:
+                yield series_id, event
+
+
+def _start_date(entry) -> datetime.date:
+    return entry[0]
+
+
+def is_same_venue(a: dict[str, typing.Any], b: dict[str, typing.Any]) -> bool:
+    if a.get("latLng") is not None and b.get("latLng") is not None:
+        distance = venues.distance_km(a["latLng"], b["latLng"])
+        if distance <= DUPLICATE_DISTANCE_KM:
+            return True
+        if distance > SIMILAR_VENUE_DISTANCE_KM:
+            return False
+
+    return bool(
+        a.get("venue")
+        and b.get("venue")
+        and venues.similar_names(
+            a["venue"], b["venue"], f"{a.get('address', '')} {b.get('address', '')}"
+        )
+    )
+
+
+def series_id_for(fn: str) -> str:
+    series_id, _ = os.path.splitext(os.path.basename(fn))
+    return series_id
+
+
+def load_index(store) -> EventIndex:
+    index = EventIndex()
+    for fn, series in store.iter_series():
+        for event in series["events"]:
+            index.add(series_id_for(fn), event)
+    return index
+
+
+def main():
+    index = load_index(storage.connect())
+
+    # Events without a location don't find every match from their side, so pairs are
+    # collected from both.
+    reported = set()
+    for series_id, event in index:
+        for other_series_id, other in index.likely_duplicates(series_id, event):
+            pair = tuple(
+                sorted([(series_id, event["id"]), (other_series_id, other["id"])])
+            )
+            if pair in reported:
+                continue
+            reported.add(pair)
+            (_, a), (_, b) = pair
+            print(f"{a}\t{b}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.13"
+# dependencies = []
+# ///
+import argparse
+import collections
+import hashlib
+import http.server
+import json
+import logging
+import threading
+import time
+import urllib.parse
+
+
+logging.basicConfig(level=logging.INFO)
+
+
+def _place_id(query: str) -> str:
+    return f"fake-{hashlib.sha256(query.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _lat_lng(place_id: str) -> tuple[float, float]:
+    digest = hashlib.sha256(place_id.encode("utf-8")).digest()
+    return (
+        int.from_bytes(digest[:4]) / 2**32 * 120 - 60,
+        int.from_bytes(digest[4:8]) / 2**32 * 360 - 180,
+    )
+
+
+class FakePlaces:
+    """Deterministic stand-in for the Places endpoints the importers use.
+
+    A query like "Venue, City, US" resolves to a place named "Venue" in country US,
+    located at the center of the location bias if one is given.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.queries = {}
+        self.locations = {}
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+
+    def _register(self, query: str, location: tuple[float, float] | None) -> str:
+        place_id = _place_id(query)
+        with self.lock:
+            self.queries[place_id] = query
+            if location is not None:
+                self.locations[place_id] = location
+        return place_id
+
+    def _details(self, place_id: str, language: str | None) -> dict:
+        query = self.queries.get(place_id, place_id)
+        name, *rest = [part.strip() for part in query.split(",")]
+        country = rest[-1] if rest and len(rest[-1]) == 2 else "US"
+        lat, lng = self.locations.get(place_id) or _lat_lng(place_id)
+        if language is not None and language != "en" and not language.startswith("en-"):
+            name = f"{name} ({language})"
+        return {
+            "place_id": place_id,
+            "name": name,
+            "formatted_address": ", ".join(rest) if rest else country,
+            "geometry": {"location": {"lat": lat, "lng": lng}},
+            "address_components": [
+                {"long_name": country, "short_name": country, "types": ["country"]}
+            ],
+        }
+
+    def handle(self, path: str, params: dict[str, str]) -> dict:
+        with self.lock:
+            self.counts[path] += 1
+        time.sleep(self.latency)
+
+        match path:
+            case "/maps/api/place/autocomplete/json":
+                query = params["input"]
+                return {
+                    "status": "OK",
+                    "predictions": [
+                        {
+                            "place_id": self._register(query, None),
+                            "description": query,
+                        }
+                    ],
+                }
+
+            case "/maps/api/place/details/json":
+                return {
+                    "status": "OK",
+                    "result": self._details(params["placeid"], params.get("language")),
+                }
+
+            case "/maps/api/place/findplacefromtext/json":
+                query = params["input"]
+                location = None
+                bias = params.get("locationbias", "")
+                if bias.startswith("circle:"):
+                    _, _, center = bias.partition("@")
+                    lat, lng = center.split(",")
+                    location = (float(lat), float(lng))
+                place_id = self._register(query, location)
+                return {
+                    "status": "OK",
+                    "candidates": [self._details(place_id, params.get("language"))],
+                }
+
+        return {"status": "INVALID_REQUEST"}
+
+
+def make_server(host: str, port: int, latency: float) -> http.server.HTTPServer:
+    """Returns a server for FakePlaces; the instance is available as server.places."""
+    places = FakePlaces(latency)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            body = json.dumps(places.handle(url.path, params)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.info(format, *args)
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.places = places
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a fake Google Places API for testing and benchmarking."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds to delay each response"
+    )
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency)
+    logging.info(
+        f"serving on http://{args.host}:{args.port}, "
+        "use GOOGLE_MAPS_BASE_URL with GOOGLE_MAPS_API_KEY=AIzaFake"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for path, count in sorted(server.places.counts.items()):
+            logging.info(f"{count} requests to {path}")
+
+
+if __name__ == "__main__":
+    main()
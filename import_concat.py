@@ -8,14 +8,14 @@
 # ]
 # ///
 
+import changefeed
 import sys
-import json
 import logging
-import googlemaps
-import httpx
 import re
+import replay
+import storage
 import os
-import uuid
+import profiling
 import urllib.parse
 import whenever
 
@@ -23,7 +23,7 @@ logging.basicConfig(level=logging.INFO)
 
 
 def main():
-    gmaps = googlemaps.Client(key=os.environ["GOOGLE_MAPS_API_KEY"])
+    gmaps = replay.gmaps_client(os.environ.get("GOOGLE_MAPS_API_KEY"))
     today = whenever.Instant.now().to_system_tz().date()
 
     _, fn, concat_url = sys.argv
@@ -31,16 +31,18 @@ def main():
 
     series_id, _ = os.path.splitext(fn)
 
-    with open(fn) as f:
-        series = json.load(f)
+    store = storage.connect()
+    series = store.load(fn)
+    changes = changefeed.Pending("concat")
 
     venue_details = {
         event["venue"]: {k: v for k, v in event.items() if k in {"address", "latLng"}}
         for event in series["events"]
     }
 
-    resp = httpx.get(f"{concat_url}/api/config")
-    resp.raise_for_status()
+    with replay.http_client() as client:
+        resp = client.get(f"{concat_url}/api/config")
+        resp.raise_for_status()
     config = resp.json()
 
     for convention in config["conventions"]:
@@ -67,6 +69,7 @@ def main():
             i = len(events)
 
         previous_event = None
+        replaced_event = None
         if i < len(events):
             previous_event = events[i]
             if previous_event["id"] == id:
@@ -81,11 +84,20 @@ def main():
                         == end_date.year
                     ):
                         if start_date > today and end_date > today:
+                            old_event = dict(previous_event)
                             previous_event["startDate"] = start_date.format_common_iso()
                             previous_event["endDate"] = end_date.format_common_iso()
+                            if previous_event != old_event:
+                                changes.record(
+                                    series_id,
+                                    id,
+                                    "updated",
+                                    old_event,
+                                    previous_event,
+                                )
                         continue
 
-                del events[i]
+                replaced_event = events.pop(i)
 
         venue = convention["venue"]
 
@@ -96,20 +108,14 @@ def main():
             address = None
             lat_lng = None
 
-            session_token = str(uuid.uuid4())
+            candidates = gmaps.find_place(
+                f"{venue}, {country}",
+                "textquery",
+                fields=["geometry/location", "name", "formatted_address"],
+            )["candidates"]
 
-            predictions = gmaps.places_autocomplete(
-                f"{venue}, {country}", session_token=session_token
-            )
-
-            if predictions:
-                prediction, *_ = predictions
-
-                place = gmaps.place(
-                    prediction["place_id"],
-                    session_token=session_token,
-                    fields=["geometry/location", "name", "formatted_address"],
-                )["result"]
+            if candidates:
+                place, *_ = candidates
                 address = place["formatted_address"]
                 l = place["geometry"]["location"]
                 lat_lng = [l["lat"], l["lng"]]
@@ -148,12 +154,21 @@ def main():
             "latLng": lat_lng,
         }
         logging.info(f"imported: {event}")
-        events.insert(i, {k: v for k, v in event.items() if v is not None})
+        event = {k: v for k, v in event.items() if v is not None}
+        events.insert(i, event)
+        changes.record(
+            series_id,
+            id,
+            "added" if replaced_event is None else "updated",
+            replaced_event,
+            event,
+        )
 
-    with open(fn, "w") as f:
-        json.dump(series, f, indent=2, ensure_ascii=False)
-        f.write("\n")
+    store.save(fn, series)
+    changes.flush()
 
 
 if __name__ == "__main__":
-    main()
+    series_id, _ = os.path.splitext(os.path.basename(sys.argv[1]))
+    with profiling.profile("import_concat", series_id):
+        main()
@@ -6,12 +6,14 @@
 #   "whenever",
 # ]
 # ///
+import changefeed
 import dataclasses
 import logging
 import whenever
-import httpx
-import json
 import os
+import profiling
+import replay
+import storage
 import sys
 
 
@@ -46,10 +48,10 @@ query listAllEvents($nextToken: String) {
 _, fn, endpoint, prefix = sys.argv
 
 
-def list_all_events(config):
+def list_all_events(client, config):
     next_token = None
     while True:
-        resp = httpx.post(
+        resp = client.post(
             config["graphql"]["endpoint"],
             json={
                 "operationName": "listAllEvents",
@@ -71,7 +73,7 @@ def list_all_events(config):
             if item["date_event_start"] == 0 or item["date_event_end"] == 0:
                 continue
             event_config = (
-                httpx.get(f"{endpoint}/_config/app/{item['id']}.json")
+                client.get(f"{endpoint}/_config/app/{item['id']}.json")
                 .raise_for_status()
                 .json()
             )
@@ -93,13 +95,16 @@ def list_all_events(config):
 def main():
     series_id, _ = os.path.splitext(fn)
 
-    with open(fn, "r") as f:
-        series = json.load(f)
+    store = storage.connect()
+    series = store.load(fn)
+    changes = changefeed.Pending("eventdrake")
 
     events = series["events"]
-    config = httpx.get(f"{endpoint}/_config/system.json").raise_for_status().json()
+    with replay.http_client() as client:
+        config = client.get(f"{endpoint}/_config/system.json").raise_for_status().json()
+        imported_events = list(list_all_events(client, config))
 
-    for imported in list_all_events(config):
+    for imported in imported_events:
         for i, e in enumerate(events):
             if (
                 whenever.Date.parse_common_iso(e["startDate"]).year
@@ -118,8 +123,17 @@ def main():
                 and whenever.Date.parse_common_iso(previous_event["endDate"]).year
                 == imported.end_date.year
             ):
+                old_event = dict(previous_event)
                 previous_event["startDate"] = imported.start_date.format_common_iso()
                 previous_event["endDate"] = imported.end_date.format_common_iso()
+                if previous_event != old_event:
+                    changes.record(
+                        series_id,
+                        previous_event["id"],
+                        "updated",
+                        old_event,
+                        previous_event,
+                    )
                 continue
         else:
             previous_event = events[-1]
@@ -137,12 +151,15 @@ def main():
             },
         }
         logging.info(f"imported: {event}")
-        events.insert(i, {k: v for k, v in event.items() if v is not None})
+        event = {k: v for k, v in event.items() if v is not None}
+        events.insert(i, event)
+        changes.record(series_id, event["id"], "added", None, event)
 
-    with open(fn, "w") as f:
-        json.dump(series, f, indent=2, ensure_ascii=False)
-        f.write("\n")
+    store.save(fn, series)
+    changes.flush()
 
 
 if __name__ == "__main__":
-    main()
+    series_id, _ = os.path.splitext(os.path.basename(fn))
+    with profiling.profile("import_eventdrake", series_id):
+        main()
@@ -12,8 +12,11 @@
 # ///
 import asyncio
 from bs4 import BeautifulSoup
+import changefeed
+import concurrent.futures
 import dataclasses
 import datetime
+import duplicates
 import eviltransform
 import html
 import httpx
@@ -24,9 +27,13 @@ import icu
 import logging
 import pathlib
 import regex
+import replay
+import storage
 import os
+import profiling
 import typing
 import unicodedata
+import venues
 import xml.etree.ElementTree as ET
 
 
@@ -37,6 +44,10 @@ def guess_language_for_region(region_code: str) -> icu.Locale:
     return icu.Locale.createFromName(f"und_{region_code}").addLikelySubtags()
 
 
+def parse_locale(locale: str | icu.Locale) -> icu.Locale:
+    return icu.Locale(str(locale).replace("-", "_")).addLikelySubtags()
+
+
 def slugify(s: str, langid: icu.Locale) -> str:
     try:
         trans = icu.Transliterator.createInstance(f"{langid.getLanguage()}-ASCII")
@@ -62,6 +73,14 @@ async def fetch_bytes(client: httpx.AsyncClient, url: str) -> bytes:
     return resp.content
 
 
+def dump_json_atomic(fn: str, data: typing.Any, sort_keys: bool = False):
+    tmp = f"{fn}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=sort_keys)
+        f.write("\n")
+    os.replace(tmp, fn)
+
+
 with open(os.path.join(os.path.dirname(__file__), "fancons_ignore"), "r") as f:
     IGNORE = {line.strip() for line in f}
 
@@ -70,6 +89,33 @@ with open(os.path.join(os.path.dirname(__file__), "countries.json"), "r") as f:
     COUNTRIES = json.load(f)
 
 
+def alias_key(name: str) -> str:
+    return unicodedata.normalize("NFKC", name).casefold()
+
+
+# Maps FanCons event ids and alternative series names to series ids, for cons that
+# FanCons names differently from us. This lives with the series data, and the event id
+# of anything resolved through a name alias is recorded so that it keeps resolving if
+# FanCons renames it again.
+ALIASES_PATH = os.environ.get("FANCONS_ALIASES", "fancons_aliases.json")
+try:
+    with open(ALIASES_PATH, "r") as f:
+        ALIASES = json.load(f)
+except FileNotFoundError:
+    ALIASES = {}
+if not isinstance(ALIASES, dict) or not all(
+    isinstance(ALIASES.get(k, {}), dict) for k in ["ids", "names"]
+):
+    raise ValueError(
+        f'{ALIASES_PATH} must be an object whose "ids" and "names" are objects'
+    )
+# Either may be left out of the file.
+ALIASES = {"ids": {}, "names": {}, **ALIASES}
+NAME_ALIASES = {
+    alias_key(name): series_id for name, series_id in ALIASES["names"].items()
+}
+
+
 OUTPUT_DIR = pathlib.Path(os.environ.get("OUTPUT_DIR", "."))
 CALENDAR_URL = os.environ.get(
     "CALENDAR_URL", "https://furrycons.com/calendar/calendar.php"
@@ -77,7 +123,28 @@ CALENDAR_URL = os.environ.get(
 MAP_URL = os.environ.get(
     "MAP_URL", "https://furrycons.com/calendar/map/yc-maps/map-upcoming.xml"
 )
-GOOGLE_MAPS_API_KEY = os.environ["GOOGLE_MAPS_API_KEY"]
+GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
+
+# How far from a FanCons map marker to bias the venue search, in meters.
+PLACE_SEARCH_RADIUS = 5000
+
+# How far from a FanCons map marker a similarly named venue we already have can be for
+# it to be reused without geocoding.
+VENUE_REUSE_RADIUS_KM = float(os.environ.get("VENUE_REUSE_RADIUS_KM", "1"))
+
+# Backfill mode: when BACKFILL_YEARS is set (e.g. "2005-2024"), past years are imported
+# from ARCHIVE_URL (with {year} in it) instead of the upcoming calendar. Completed years
+# are recorded in BACKFILL_CHECKPOINT so an interrupted backfill picks up where it left
+# off.
+BACKFILL_YEARS = os.environ.get("BACKFILL_YEARS")
+ARCHIVE_URL = os.environ.get("ARCHIVE_URL")
+if BACKFILL_YEARS and not ARCHIVE_URL:
+    raise ValueError("ARCHIVE_URL must be set to backfill")
+BACKFILL_CHECKPOINT = os.environ.get("BACKFILL_CHECKPOINT", ".fancons_backfill.json")
+# How many archive pages to fetch at once.
+BACKFILL_CONCURRENCY = int(os.environ.get("BACKFILL_CONCURRENCY", "4"))
+# How many years to merge before writing out changed series.
+BACKFILL_BATCH_SIZE = int(os.environ.get("BACKFILL_BATCH_SIZE", "10"))
 
 
 async def fetch_map(
@@ -138,63 +205,163 @@ class Event:
     lat_lng: tuple[float, float] | None
     canceled: bool
     sources: typing.List[str] | None
+    fancons_id: str | None
 
     def update_via_geocode(self, gmaps: googlemaps.Client):
-        session_token = str(uuid.uuid4())
-
-        predictions = gmaps.places_autocomplete(
-            ", ".join(part for part in [self.venue, self.address] if part is not None),
-            session_token=session_token,
+        query = ", ".join(
+            part for part in [self.venue, self.address] if part is not None
         )
 
-        if predictions:
-            prediction, *_ = predictions
-
-            place = gmaps.place(
-                prediction["place_id"],
-                session_token=session_token,
-                fields=[
-                    "name",
-                    "formatted_address",
-                    "geometry/location",
-                    "address_component",
-                ],
-                language=str(self.locale),
-            )["result"]
+        # Guess from the locale we already have whether English details will be
+        # needed, so both languages can be requested at the same time.
+        self.locale = parse_locale(self.locale)
+        language = f"{self.locale.getLanguage()}-{self.locale.getCountry()}"
+        wants_en = self.locale.getScript() != "Latn"
+
+        session_token = None
+        with concurrent.futures.ThreadPoolExecutor() as pool:
+            if self.lat_lng is not None:
+                # The map marker already pins the venue, so search around it directly
+                # instead of going through autocomplete first.
+                lat, lng = self.lat_lng
+
+                def find_place(language: str, fields: list[str]):
+                    candidates = gmaps.find_place(
+                        query,
+                        "textquery",
+                        fields=["place_id", *fields],
+                        location_bias=f"circle:{PLACE_SEARCH_RADIUS}@{lat},{lng}",
+                        language=language,
+                    )["candidates"]
+                    return candidates[0] if candidates else None
+
+                place_future = pool.submit(
+                    find_place,
+                    language,
+                    ["name", "formatted_address", "geometry/location"],
+                )
+                en_future = (
+                    pool.submit(find_place, "en", ["name", "formatted_address"])
+                    if wants_en
+                    else None
+                )
+
+                place = place_future.result()
+                if place is None:
+                    return
+                place_id = place["place_id"]
+
+            else:
+                session_token = str(uuid.uuid4())
+
+                predictions = gmaps.places_autocomplete(
+                    query, session_token=session_token
+                )
+                if not predictions:
+                    return
+                prediction, *_ = predictions
+                place_id = prediction["place_id"]
+
+                def fetch_place(language: str, fields: list[str]):
+                    return {
+                        "place_id": place_id,
+                        **gmaps.place(
+                            place_id,
+                            session_token=session_token,
+                            fields=fields,
+                            language=language,
+                        )["result"],
+                    }
+
+                place_future = pool.submit(
+                    fetch_place,
+                    language,
+                    [
+                        "name",
+                        "formatted_address",
+                        "geometry/location",
+                        "address_component",
+                    ],
+                )
+                en_future = (
+                    pool.submit(fetch_place, "en", ["name", "formatted_address"])
+                    if wants_en
+                    else None
+                )
+
+                place = place_future.result()
+                country = next(
+                    component["short_name"]
+                    for component in place["address_components"]
+                    if "country" in component["types"]
+                )
+                self.locale = guess_language_for_region(country)
 
             self.venue = place["name"]
             self.address = place["formatted_address"]
 
             l = place["geometry"]["location"]
             self.lat_lng = (l["lat"], l["lng"])
-            country = next(
-                component["short_name"]
-                for component in place["address_components"]
-                if "country" in component["types"]
-            )
-            self.locale = guess_language_for_region(country)
 
             if self.locale.getCountry() == "CN":
                 lat, lng = self.lat_lng
                 self.lat_lng = eviltransform.gcj2wgs(lat, lng)
 
             if self.locale.getScript() != "Latn":
-                enPlace = gmaps.place(
-                    prediction["place_id"],
-                    session_token=session_token,
-                    fields=[
-                        "name",
-                        "formatted_address",
-                    ],
-                    language="en",
-                )["result"]
+                en_place = en_future.result() if en_future is not None else None
+                if en_place is None or en_place["place_id"] != place_id:
+                    en_place = gmaps.place(
+                        place_id,
+                        session_token=session_token,
+                        fields=[
+                            "name",
+                            "formatted_address",
+                        ],
+                        language="en",
+                    )["result"]
 
                 enTranslations = self.translations.setdefault("en", {})
-                enTranslations["venue"] = enPlace["name"]
-                enTranslations["address"] = enPlace["formatted_address"]
-
-    def materialize_entry(self, gmaps: googlemaps.Client):
-        self.update_via_geocode(gmaps)
+                enTranslations["venue"] = en_place["name"]
+                enTranslations["address"] = en_place["formatted_address"]
+
+    def update_via_known_venue(self, venue: dict[str, typing.Any]):
+        self.venue = venue["venue"]
+        self.address = venue["address"]
+        self.locale = parse_locale(venue["locale"] or self.locale)
+        self.lat_lng = tuple(venue["latLng"])
+        for language, translation in venue["translations"].items():
+            self.translations.setdefault(language, {}).update(translation)
+
+    def materialize_entry(
+        self,
+        gmaps: googlemaps.Client,
+        venue_index: venues.VenueIndex,
+        series_events: list[dict[str, typing.Any]],
+    ):
+        if self.lat_lng is not None:
+            known_venue = venue_index.find(
+                self.lat_lng, self.venue, VENUE_REUSE_RADIUS_KM, self.address
+            )
+        else:
+            # Without a map marker (e.g. when backfilling) there's nowhere to search
+            # around, but the series has usually been at the same venue before. Its
+            # events closest in time are the most likely to be.
+            known_venue = venues.find_by_name(
+                sorted(
+                    series_events,
+                    key=lambda e: abs(
+                        datetime.date.fromisoformat(e["startDate"]).year
+                        - self.start_date.year
+                    ),
+                ),
+                self.venue,
+                self.address,
+            )
+        if known_venue is not None:
+            logging.info(f"Reusing known venue {known_venue['venue']} for {self.id}")
+            self.update_via_known_venue(known_venue)
+        else:
+            self.update_via_geocode(gmaps)
         return {
             "id": self.id,
             "name": self.name,
@@ -216,92 +383,122 @@ class Event:
         }
 
 
-async def fetch_events():
+def parse_events(
+    calendar: list[dict[str, typing.Any]], markers: dict[str, tuple[float, float]]
+) -> typing.Iterator[Event]:
+    for entry in calendar:
+        try:
+            name = entry["name"]
+            prefix, year = entry["name"].rsplit(" ", 1)
+
+            url = entry["url"]
+            start_date = datetime.date.fromisoformat(entry["startDate"])
+            end_date = datetime.date.fromisoformat(entry["endDate"])
+            loc = entry["location"]
+            venue = loc["name"]
+            address_parts = loc["address"]
+            country_name = address_parts["addressCountry"]
+            country = COUNTRIES[country_name]
+            address = ", ".join(
+                part
+                for part in [
+                    address_parts.get("addressLocality", ""),
+                    address_parts.get("addressRegion", ""),
+                    country_name,
+                ]
+                if part
+            )
+            canceled = entry["eventStatus"] not in {
+                "https://schema.org/EventScheduled",
+                "https://schema.org/EventRescheduled",
+            }
+
+            locale = guess_language_for_region(country)
+
+            match = regex.search(r"/event/(\d+)/", url)
+            assert match is not None
+            fc_id = match.group(1)
+            lat_lng = markers.get(fc_id) if fc_id else None
+
+            series_id = (
+                ALIASES["ids"].get(fc_id)
+                or NAME_ALIASES.get(alias_key(prefix))
+                or slugify(prefix, locale)
+            )
 
-    async with httpx.AsyncClient() as client:
-        calendar, markers = await asyncio.gather(
-            fetch_calendar(client, CALENDAR_URL),
-            fetch_map(client, MAP_URL),
-        )
+            yield Event(
+                series_id=series_id,
+                series_name=prefix,
+                id=f"{series_id}-{year}",
+                name=name,
+                url=url,
+                start_date=start_date,
+                end_date=end_date,
+                venue=venue,
+                address=address,
+                locale=f"{locale.getLanguage()}-{locale.getCountry()}",
+                age_restriction=None,
+                translations={},
+                lat_lng=lat_lng,
+                canceled=canceled,
+                sources=["fancons.com"],
+                fancons_id=fc_id,
+            )
 
-        for entry in calendar:
-            try:
-                name = entry["name"]
-                prefix, year = entry["name"].rsplit(" ", 1)
-
-                url = entry["url"]
-                start_date = datetime.date.fromisoformat(entry["startDate"])
-                end_date = datetime.date.fromisoformat(entry["endDate"])
-                loc = entry["location"]
-                venue = loc["name"]
-                address_parts = loc["address"]
-                country_name = address_parts["addressCountry"]
-                country = COUNTRIES[country_name]
-                address = ", ".join(
-                    part
-                    for part in [
-                        address_parts.get("addressLocality", ""),
-                        address_parts.get("addressRegion", ""),
-                        country_name,
-                    ]
-                    if part
-                )
-                canceled = entry["eventStatus"] not in {
-                    "https://schema.org/EventScheduled",
-                    "https://schema.org/EventRescheduled",
-                }
-
-                locale = guess_language_for_region(country)
-                series_id = slugify(prefix, locale)
-
-                match = regex.search(r"/event/(\d+)/", url)
-                assert match is not None
-                fc_id = match.group(1)
-                lat_lng = markers.get(fc_id) if fc_id else None
-
-                yield Event(
-                    series_id=series_id,
-                    series_name=prefix,
-                    id=f"{series_id}-{year}",
-                    name=name,
-                    url=url,
-                    start_date=start_date,
-                    end_date=end_date,
-                    venue=venue,
-                    address=address,
-                    locale=f"{locale.getLanguage()}-{locale.getCountry()}",
-                    age_restriction=None,
-                    translations={},
-                    lat_lng=lat_lng,
-                    canceled=canceled,
-                    sources=["fancons.com"],
-                )
+        except Exception as e:
+            logging.warning(f"Failed to process event: {e}")
 
-            except Exception as e:
-                logging.warning(f"Failed to process event: {e}")
 
+class EventMerger:
+    """Merges FanCons events into series, keeping loaded series in memory.
 
-async def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    Changed series are only written out by flush(), so callers decide how often.
+    """
 
-    gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-    async for event in fetch_events():
-        if event.series_id in IGNORE:
-            continue
+    def __init__(self, store, gmaps: googlemaps.Client):
+        self.store = store
+        self.gmaps = gmaps
+
+        # List the series once up front instead of probing for every event.
+        self.existing = store.listdir(".")
+        self.pending = store.listdir("import_pending")
+        self.aliases_changed = False
 
+        self.series = {}
+        self.dirty = set()
+        self.changes = changefeed.Pending("fancons")
+
+        # Only built once there's a new event, since they need every series to be read.
+        self.event_index = None
+        self.venue_index = None
+
+    def _load(self, event: Event) -> tuple[str, dict[str, typing.Any]]:
         fn = f"{event.series_id}.json"
 
-        if os.path.exists(fn):
-            with open(fn, "r") as f:
-                series = json.load(f)
+        if fn in self.existing:
+            if (
+                event.fancons_id not in ALIASES["ids"]
+                and NAME_ALIASES.get(alias_key(event.series_name)) == event.series_id
+            ):
+                ALIASES["ids"][event.fancons_id] = event.series_id
+                self.aliases_changed = True
+        elif fn in self.pending:
+            fn = os.path.join("import_pending", fn)
         else:
+            logging.info(f"Adding pending series {event.series_id}")
+            self.pending.add(fn)
             fn = os.path.join("import_pending", fn)
-            if os.path.exists(fn):
-                with open(fn, "r") as f:
-                    series = json.load(f)
-            else:
-                logging.info(f"Adding pending series {event.series_id}")
-                series = {"name": event.series_name, "events": []}
+            self.series[fn] = {"name": event.series_name, "events": []}
+
+        if fn not in self.series:
+            self.series[fn] = self.store.load(fn)
+        return fn, self.series[fn]
+
+    def add(self, event: Event):
+        if event.series_id in IGNORE:
+            return
+
+        fn, series = self._load(event)
 
         for i, e in enumerate(series["events"]):
             start_date = datetime.date.fromisoformat(e["startDate"])
@@ -330,7 +527,7 @@ async def main():
                 event.start_date.year == previous_start_date.year
                 and event.end_date.year == previous_end_date.year
             ):
-                continue
+                return
 
             try:
                 previous_suffix = int(previous_suffix)
@@ -346,14 +543,149 @@ async def main():
                     event.id = f"{event.series_id}-{suffix}"
 
             if previous_event["id"] == event.id:
-                continue
+                return
 
         logging.info(f"Adding event {event.id} to {event.series_id}")
-        series["events"].insert(i, event.materialize_entry(gmaps))
-        with open(fn, "w") as f:
-            json.dump(series, f, ensure_ascii=False, indent=2)
-            f.write("\n")
+        if self.event_index is None:
+            self.event_index = duplicates.EventIndex()
+            self.venue_index = venues.VenueIndex()
+            for other_fn, other_series in self.store.iter_series():
+                for e in other_series["events"]:
+                    self.event_index.add(duplicates.series_id_for(other_fn), e)
+                    self.venue_index.add(e)
+
+        entry = event.materialize_entry(self.gmaps, self.venue_index, series["events"])
+
+        for other_series_id, other in self.event_index.likely_duplicates(
+            event.series_id, entry
+        ):
+            logging.warning(
+                f"{event.id} may be a duplicate of {other['id']} in {other_series_id}"
+            )
+        self.event_index.add(event.series_id, entry)
+        self.venue_index.add(entry)
+
+        series["events"].insert(i, entry)
+        self.changes.record(event.series_id, event.id, "added", None, entry)
+        self.dirty.add(fn)
+
+    def flush(self):
+        """Writes out every series changed since the last flush, in one transaction."""
+        # Most calendar entries change nothing, and shouldn't take the write lock.
+        if not self.dirty:
+            return
+        with self.store.transaction():
+            for fn in sorted(self.dirty):
+                self.store.save(fn, self.series[fn])
+        self.changes.flush()
+        self.dirty.clear()
+
+    def save_aliases(self):
+        if not self.aliases_changed:
+            return
+        # Written atomically, since it's also edited by hand.
+        dump_json_atomic(ALIASES_PATH, ALIASES, sort_keys=True)
+        self.aliases_changed = False
+
+
+def parse_years(years: str) -> list[int]:
+    first, _, last = years.partition("-")
+    return list(range(int(first), int(last or first) + 1))
+
+
+def load_checkpoint() -> set[int]:
+    try:
+        with open(BACKFILL_CHECKPOINT, "r") as f:
+            return set(json.load(f)["done"])
+    except FileNotFoundError:
+        return set()
+
+
+def save_checkpoint(done: set[int]):
+    dump_json_atomic(BACKFILL_CHECKPOINT, {"done": sorted(done)})
+
+
+async def backfill(merger: EventMerger, years: list[int]):
+    done = load_checkpoint()
+    years = [year for year in years if year not in done]
+    if not years:
+        logging.info("Nothing left to backfill")
+        return
+
+    semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+    async def fetch_year(year: int) -> list[dict[str, typing.Any]]:
+        async with semaphore:
+            logging.info(f"Fetching archive for {year}")
+            return await fetch_calendar(client, ARCHIVE_URL.format(year=year))
+
+    async with replay.async_http_client() as client:
+        # Fetch ahead while merging, but merge oldest first so that each event is
+        # numbered and inherits from the one before it.
+        tasks = [asyncio.create_task(fetch_year(year)) for year in years]
+        try:
+            batch = []
+            for year, task in zip(years, tasks):
+                # Anything else means the page isn't that year's archive.
+                calendar = [
+                    entry
+                    for entry in await task
+                    if str(entry.get("startDate", "")).startswith(f"{year}-")
+                ]
+                if calendar:
+                    # The archive has no map markers.
+                    for event in parse_events(calendar, {}):
+                        merger.add(event)
+                    batch.append(year)
+                else:
+                    logging.warning(
+                        f"No {year} events at {ARCHIVE_URL.format(year=year)}, "
+                        "leaving it to be retried"
+                    )
+
+                if batch and (len(batch) >= BACKFILL_BATCH_SIZE or year == years[-1]):
+                    # Only checkpoint what has been written out, so an interrupted
+                    # backfill redoes at most one batch.
+                    merger.flush()
+                    merger.save_aliases()
+                    done.update(batch)
+                    save_checkpoint(done)
+                    logging.info(f"Backfilled {', '.join(map(str, batch))}")
+                    batch = []
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    store = storage.connect()
+    gmaps = replay.gmaps_client(GOOGLE_MAPS_API_KEY)
+    merger = EventMerger(store, gmaps)
+
+    if BACKFILL_YEARS:
+        await backfill(merger, parse_years(BACKFILL_YEARS))
+        return
+
+    async with replay.async_http_client() as client:
+        calendar, markers = await asyncio.gather(
+            fetch_calendar(client, CALENDAR_URL),
+            fetch_map(client, MAP_URL),
+        )
+
+    # Each event is committed on its own, so that the database is never locked while
+    # geocoding and other importers sharing it aren't kept waiting.
+    for event in parse_events(calendar, markers):
+        merger.add(event)
+        merger.flush()
+
+    merger.save_aliases()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # One run covers every series, so the profile is named after the mode instead.
+    with profiling.profile(
+        "import_fancons", "backfill" if BACKFILL_YEARS else "calendar"
+    ):
+        asyncio.run(main())
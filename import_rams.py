@@ -8,24 +8,19 @@
 # ]
 # ///
 from bs4 import BeautifulSoup
-import datetime
-import httpx
-import json
+import changefeed
+import dataclasses
 import logging
+import os
+import profiling
 import re
+import replay
+import storage
+import sys
 import whenever
 
-fn = "midwest-furfest.json"
-
 logging.basicConfig(level=logging.INFO)
 
-LOCATION = {
-    "venue": "Donald E. Stephens Convention Center",
-    "address": "5555 N River Rd, Rosemont, IL 60018, United States",
-    "locale": "en_US",
-    "latLng": [41.9792232, -87.861987],
-}
-
 MONTHS = [
     "",
     "January",
@@ -42,32 +37,46 @@ MONTHS = [
     "December",
 ]
 
+# Matches the output of RAMS' event_dates tag:
+# https://github.com/MidwestFurryFandom/rams/blob/fc845002466b91fe443158eb4923901c14010b4f/uber/custom_tags.py#L131-L138
+MONTH_PATTERN = "|".join(MONTHS[1:])
+DATES_PATTERN = rf"(?:{MONTH_PATTERN}) \d+(?: - (?:{MONTH_PATTERN}) \d+|-\d+)?"
 
-def main():
-    with open(fn, "r") as f:
-        series = json.load(f)
+# Instance-specific places the landing page puts the dates, tried before searching the
+# whole page.
+DATES_SELECTORS = ["#mff_read_more > strong"]
 
-    resp = httpx.get("https://reg.furfest.org/landing/index")
-    resp.raise_for_status()
 
-    soup = BeautifulSoup(resp.content, "html.parser")
-    (title,) = soup.select("#mainContainer .landing-title")
-    (dates,) = soup.select("#mff_read_more > strong")
+@dataclasses.dataclass
+class ImportedEvent:
+    start_date: whenever.Date
+    end_date: whenever.Date
 
-    title = title.text
-    dates = dates.text
 
-    match = re.match(r"Midwest FurFest (\d+) Registration", title)
-    assert match is not None
-    year = int(match.group(1))
-
-    id = f"midwest-furfest-{year}"
-    if any(event["id"] == id for event in series["events"]):
-        return
+def fetch_via_api(client, rams_url: str, api_token: str) -> ImportedEvent:
+    resp = client.post(
+        f"{rams_url}/jsonrpc/",
+        json={
+            "jsonrpc": "2.0",
+            "method": "config.info",
+            # Fixed, so that recorded requests match on replay.
+            "id": 1,
+        },
+        headers={"X-Auth-Token": api_token},
+    )
+    resp.raise_for_status()
+    body = resp.json()
+    if "error" in body:
+        raise Exception(body["error"])
+    info = body["result"]
+
+    return ImportedEvent(
+        start_date=whenever.Date.parse_common_iso(info["EPOCH"][:10]),
+        end_date=whenever.Date.parse_common_iso(info["ESCHATON"][:10]),
+    )
 
-    name = f"Midwest FurFest {year}"
 
-    # https://github.com/MidwestFurryFandom/rams/blob/fc845002466b91fe443158eb4923901c14010b4f/uber/custom_tags.py#L131-L138
+def parse_dates(dates: str, year: int) -> tuple[whenever.Date, whenever.Date]:
     if " - " in dates:
         start, end = dates.split(" - ", 1)
         start_month, start_day = start.split(" ", 1)
@@ -81,14 +90,62 @@ def main():
         start_month = end_month = month
         start_day = end_day = day
 
-    start_month = MONTHS.index(start_month)
-    start_day = int(start_day)
+    return (
+        whenever.Date(year, MONTHS.index(start_month), int(start_day)),
+        whenever.Date(year, MONTHS.index(end_month), int(end_day)),
+    )
+
+
+def fetch_via_landing_page(client, rams_url: str) -> ImportedEvent:
+    resp = client.get(f"{rams_url}/landing/index")
+    resp.raise_for_status()
+
+    soup = BeautifulSoup(resp.content, "html.parser")
+    (title,) = soup.select(".landing-title")
+
+    match = re.search(r"(\d{4}) Registration", title.text)
+    assert match is not None
+    year = int(match.group(1))
+
+    for selector in DATES_SELECTORS:
+        elements = soup.select(selector)
+        if elements:
+            dates = elements[0].text.strip()
+            break
+    else:
+        match = re.search(DATES_PATTERN, soup.get_text(" "))
+        assert match is not None
+        dates = match.group(0)
+
+    start_date, end_date = parse_dates(dates, year)
+    return ImportedEvent(start_date=start_date, end_date=end_date)
+
+
+def main():
+    _, fn, rams_url, *rest = sys.argv
+    api_token = os.environ.get(rest[0]) if rest else None
+
+    series_id, _ = os.path.splitext(os.path.basename(fn))
+
+    store = storage.connect()
+    series = store.load(fn)
+    changes = changefeed.Pending("rams")
+
+    with replay.http_client() as client:
+        imported = None
+        if api_token is not None:
+            try:
+                imported = fetch_via_api(client, rams_url, api_token)
+            except Exception as e:
+                logging.warning(f"RAMS API unavailable, scraping instead: {e}")
+
+        if imported is None:
+            imported = fetch_via_landing_page(client, rams_url)
 
-    end_month = MONTHS.index(end_month)
-    end_day = int(end_day)
+    start_date = imported.start_date
+    end_date = imported.end_date
 
-    start_date = whenever.Date(year, start_month, start_day)
-    end_date = whenever.Date(year, end_month, end_day)
+    id = f"{series_id}-{start_date.year}"
 
     events = series["events"]
     for i, e in enumerate(events):
@@ -97,22 +154,46 @@ def main():
     else:
         i = len(events)
 
-    events.insert(
-        i,
-        {
+    if i < len(events):
+        previous_event = events[i]
+        if previous_event["id"] == id:
+            if (
+                whenever.Date.parse_common_iso(previous_event["startDate"]).year
+                == start_date.year
+                and whenever.Date.parse_common_iso(previous_event["endDate"]).year
+                == end_date.year
+            ):
+                old_event = dict(previous_event)
+                previous_event["startDate"] = start_date.format_common_iso()
+                previous_event["endDate"] = end_date.format_common_iso()
+                if previous_event != old_event:
+                    changes.record(series_id, id, "updated", old_event, previous_event)
+            previous_event = None
+    else:
+        previous_event = events[-1]
+
+    if previous_event is not None:
+        event = {
             "id": id,
-            "name": name,
-            "url": "https://www.furfest.org",
+            "name": f"{series['name']} {start_date.year}",
+            "url": previous_event["url"],
             "startDate": start_date.format_common_iso(),
             "endDate": end_date.format_common_iso(),
-            **LOCATION,
-        },
-    )
+            **{
+                k: v
+                for k, v in previous_event.items()
+                if k in {"venue", "address", "locale", "ageRestriction", "latLng"}
+            },
+        }
+        logging.info(f"imported: {event}")
+        events.insert(i, event)
+        changes.record(series_id, id, "added", None, event)
 
-    with open(fn, "w") as f:
-        json.dump(series, f, indent=2, ensure_ascii=False)
-        f.write("\n")
+    store.save(fn, series)
+    changes.flush()
 
 
 if __name__ == "__main__":
-    main()
+    series_id, _ = os.path.splitext(os.path.basename(sys.argv[1]))
+    with profiling.profile("import_rams", series_id):
+        main()
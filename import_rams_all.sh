@@ -0,0 +1,15 @@
+#!/bin/bash
+script_dir="$(dirname -- "${BASH_SOURCE[0]:-$0}")"
+import="$script_dir/import_rams.py"
+
+cleanup() {
+    local exit_code=0
+    for pid in $(jobs -p); do
+        wait "$pid" || exit_code=1
+    done
+    exit $exit_code
+}
+
+trap cleanup EXIT
+
+$import midwest-furfest.json https://reg.furfest.org MFF_RAMS_API_TOKEN &
@@ -9,13 +9,16 @@
 # ]
 # ///
 
+import changefeed
 import dukpy
 import sys
 from bs4 import BeautifulSoup
 import json
 import logging
-import httpx
 import os
+import profiling
+import replay
+import storage
 import whenever
 
 logging.basicConfig(level=logging.INFO)
@@ -26,11 +29,13 @@ def main():
 
     series_id, ext = os.path.splitext(fn)
 
-    with open(fn) as f:
-        series = json.load(f)
+    store = storage.connect()
+    series = store.load(fn)
+    changes = changefeed.Pending("regfox")
 
-    resp = httpx.get(regfox_url)
-    resp.raise_for_status()
+    with replay.http_client() as client:
+        resp = client.get(regfox_url)
+        resp.raise_for_status()
 
     interpreter = dukpy.JSInterpreter()
     interpreter.evaljs("var window = {}")
@@ -68,8 +73,11 @@ def main():
                 and whenever.Date.parse_common_iso(previous_event["endDate"]).year
                 == end_date.year
             ):
+                old_event = dict(previous_event)
                 previous_event["startDate"] = start_date.format_common_iso()
                 previous_event["endDate"] = end_date.format_common_iso()
+                if previous_event != old_event:
+                    changes.record(series_id, id, "updated", old_event, previous_event)
             previous_event = None
 
     if previous_event is not None:
@@ -85,12 +93,15 @@ def main():
             "latLng": previous_event.get("latLng"),
         }
         logging.info(f"imported: {event}")
-        series["events"].insert(i, {k: v for k, v in event.items() if v is not None})
+        event = {k: v for k, v in event.items() if v is not None}
+        series["events"].insert(i, event)
+        changes.record(series_id, id, "added", None, event)
 
-    with open(fn, "w") as f:
-        json.dump(series, f, indent=2, ensure_ascii=False)
-        f.write("\n")
+    store.save(fn, series)
+    changes.flush()
 
 
 if __name__ == "__main__":
-    main()
+    series_id, _ = os.path.splitext(os.path.basename(sys.argv[1]))
+    with profiling.profile("import_regfox", series_id):
+        main()
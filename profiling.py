@@ -0,0 +1,73 @@
+import contextlib
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))
+
+
+def _format_frame(frame) -> str:
+    code = frame.f_code
+    name = (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+    return name.replace(";", ",")
+
+
+def _sample(thread_id: int, interval: float, stop: threading.Event, stacks):
+    last = time.perf_counter()
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        now = time.perf_counter()
+        # Weight by elapsed time: C calls that hold the GIL (dukpy, ICU, html.parser)
+        # delay the sampler, and that time should still be attributed to them.
+        weight = max(1, round((now - last) * 1_000_000))
+        last = now
+        if frame is None:
+            continue
+
+        stack = []
+        while frame is not None:
+            stack.append(_format_frame(frame))
+            frame = frame.f_back
+        stacks[tuple(reversed(stack))] += weight
+
+
+@contextlib.contextmanager
+def profile(importer: str, series: str):
+    """Sample the calling thread and write a collapsed-stack profile to PROFILE_DIR.
+
+    The output can be loaded directly into speedscope or fed to flamegraph.pl. Every
+    stack is rooted at the importer and series name, so profiles from several runs can
+    be concatenated into a single flamegraph. Does nothing if PROFILE_DIR is not set.
+    """
+    if PROFILE_DIR is None:
+        yield
+        return
+
+    stacks = collections.Counter()
+    stop = threading.Event()
+    sampler = threading.Thread(
+        target=_sample,
+        args=(threading.get_ident(), PROFILE_INTERVAL, stop, stacks),
+        daemon=True,
+    )
+    sampler.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        sampler.join()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        fn = os.path.join(PROFILE_DIR, f"{importer}.{series}.collapsed")
+        with open(fn, "w") as f:
+            for stack, weight in sorted(stacks.items()):
+                f.write(";".join([importer, series, *stack]))
+                f.write(f" {weight}\n")
+        logging.info(f"wrote profile to {fn}")
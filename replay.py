@@ -0,0 +1,227 @@
+import gzip
+import hashlib
+import httpx
+import json
+import logging
+import os
+import tempfile
+import typing
+
+
+RECORD_DIR = os.environ.get("RECORD_DIR")
+REPLAY_DIR = os.environ.get("REPLAY_DIR")
+
+if RECORD_DIR is not None and REPLAY_DIR is not None:
+    raise ValueError("RECORD_DIR and REPLAY_DIR cannot both be set")
+
+# These describe the body as it came over the wire, but we store it decoded.
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def _write_atomic(fn: str, data: bytes):
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fn))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, fn)
+
+
+class Snapshot:
+    """A directory of recorded upstream responses.
+
+    Each request is keyed by a hash of what was asked for and points at a gzipped
+    blob named by the hash of its content, so identical responses (e.g. the same
+    config fetched by several importers) are only stored once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def key(*parts: typing.Any) -> str:
+        return hashlib.sha256(
+            json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+    def store(self, key: str, body: bytes, meta: dict[str, typing.Any]):
+        blob = hashlib.sha256(body).hexdigest()
+        blob_fn = os.path.join(self.path, "blobs", f"{blob}.gz")
+        if not os.path.exists(blob_fn):
+            _write_atomic(blob_fn, gzip.compress(body, mtime=0))
+
+        _write_atomic(
+            os.path.join(self.path, "requests", f"{key}.json"),
+            json.dumps({**meta, "blob": blob}, indent=2).encode("utf-8"),
+        )
+
+    def load(self, key: str) -> tuple[dict[str, typing.Any], bytes] | None:
+        try:
+            with open(os.path.join(self.path, "requests", f"{key}.json"), "r") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        with gzip.open(os.path.join(self.path, "blobs", f"{meta['blob']}.gz")) as f:
+            return meta, f.read()
+
+
+def _request_key(request: httpx.Request) -> str:
+    return Snapshot.key(
+        request.method,
+        str(request.url),
+        hashlib.sha256(request.content).hexdigest(),
+    )
+
+
+def _store_response(snapshot: Snapshot, request: httpx.Request, resp: httpx.Response):
+    snapshot.store(
+        _request_key(request),
+        resp.content,
+        {
+            "method": request.method,
+            "url": str(request.url),
+            "status": resp.status_code,
+            "headers": [
+                [k, v]
+                for k, v in resp.headers.items()
+                if k.lower() not in _DROPPED_HEADERS
+            ],
+        },
+    )
+
+
+def _load_response(snapshot: Snapshot, request: httpx.Request) -> httpx.Response:
+    recorded = snapshot.load(_request_key(request))
+    if recorded is None:
+        raise httpx.TransportError(
+            f"no recorded response for {request.method} {request.url}"
+        )
+    meta, body = recorded
+    return httpx.Response(
+        meta["status"], headers=meta["headers"], content=body, request=request
+    )
+
+
+class _RecordTransport(httpx.BaseTransport):
+    def __init__(self, snapshot: Snapshot):
+        self._snapshot = snapshot
+        self._transport = httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        resp = self._transport.handle_request(request)
+        resp.read()
+        _store_response(self._snapshot, request, resp)
+        return resp
+
+    def close(self):
+        self._transport.close()
+
+
+class _ReplayTransport(httpx.BaseTransport):
+    def __init__(self, snapshot: Snapshot):
+        self._snapshot = snapshot
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return _load_response(self._snapshot, request)
+
+
+class _AsyncRecordTransport(httpx.AsyncBaseTransport):
+    def __init__(self, snapshot: Snapshot):
+        self._snapshot = snapshot
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        resp = await self._transport.handle_async_request(request)
+        await resp.aread()
+        _store_response(self._snapshot, request, resp)
+        return resp
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class _AsyncReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, snapshot: Snapshot):
+        self._snapshot = snapshot
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return _load_response(self._snapshot, request)
+
+
+def http_client(**kwargs) -> httpx.Client:
+    if RECORD_DIR is not None:
+        kwargs["transport"] = _RecordTransport(Snapshot(RECORD_DIR))
+    elif REPLAY_DIR is not None:
+        kwargs["transport"] = _ReplayTransport(Snapshot(REPLAY_DIR))
+    return httpx.Client(**kwargs)
+
+
+def async_http_client(**kwargs) -> httpx.AsyncClient:
+    if RECORD_DIR is not None:
+        kwargs["transport"] = _AsyncRecordTransport(Snapshot(RECORD_DIR))
+    elif REPLAY_DIR is not None:
+        kwargs["transport"] = _AsyncReplayTransport(Snapshot(REPLAY_DIR))
+    return httpx.AsyncClient(**kwargs)
+
+
+def _gmaps_key(name: str, args, kwargs) -> str:
+    # Session tokens are random per run and only affect billing.
+    kwargs = {k: v for k, v in kwargs.items() if k != "session_token"}
+    return Snapshot.key("googlemaps", name, args, kwargs)
+
+
+class _RecordGoogleMaps:
+    def __init__(self, snapshot: Snapshot, gmaps):
+        self._snapshot = snapshot
+        self._gmaps = gmaps
+
+    def __getattr__(self, name: str):
+        method = getattr(self._gmaps, name)
+
+        def call(*args, **kwargs):
+            result = method(*args, **kwargs)
+            self._snapshot.store(
+                _gmaps_key(name, args, kwargs),
+                json.dumps(result, ensure_ascii=False).encode("utf-8"),
+                {"method": f"googlemaps.{name}"},
+            )
+            return result
+
+        return call
+
+
+class _ReplayGoogleMaps:
+    def __init__(self, snapshot: Snapshot):
+        self._snapshot = snapshot
+
+    def __getattr__(self, name: str):
+        def call(*args, **kwargs):
+            recorded = self._snapshot.load(_gmaps_key(name, args, kwargs))
+            if recorded is None:
+                raise KeyError(f"no recorded response for googlemaps.{name}{args}")
+            _, body = recorded
+            return json.loads(body)
+
+        return call
+
+
+def gmaps_client(key: str | None, **kwargs):
+    """Returns a googlemaps.Client, or a stand-in that records or replays its calls.
+
+    In replay mode no API key is required. GOOGLE_MAPS_BASE_URL points the client at
+    another server, such as fake_places.py.
+    """
+    if REPLAY_DIR is not None:
+        logging.info(f"replaying googlemaps calls from {REPLAY_DIR}")
+        return _ReplayGoogleMaps(Snapshot(REPLAY_DIR))
+
+    import googlemaps
+
+    base_url = os.environ.get("GOOGLE_MAPS_BASE_URL")
+    if base_url is not None:
+        kwargs["base_url"] = base_url
+
+    gmaps = googlemaps.Client(key=key, **kwargs)
+    if RECORD_DIR is not None:
+        return _RecordGoogleMaps(Snapshot(RECORD_DIR), gmaps)
+    return gmaps
@@ -0,0 +1,334 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.13"
+# dependencies = []
+# ///
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import typing
+
+
+logging.basicConfig(level=logging.INFO)
+
+SERIES_DB = os.environ.get("SERIES_DB")
+
+
+def dumps_series(series: dict[str, typing.Any]) -> str:
+    """Serializes a series exactly as the importers have always written it."""
+    return json.dumps(series, indent=2, ensure_ascii=False) + "\n"
+
+
+def _key(fn: str) -> str:
+    return os.path.normpath(os.path.relpath(fn))
+
+
+SERIES_DIRECTORIES = [".", "import_pending"]
+
+
+class JSONStorage:
+    """Series stored as one JSON file each, relative to the working directory."""
+
+    def listdir(self, directory: str) -> set[str]:
+        if not os.path.isdir(directory):
+            return set()
+        return set(os.listdir(directory))
+
+    def load(self, fn: str) -> dict[str, typing.Any]:
+        with open(fn, "r") as f:
+            return json.load(f)
+
+    def save(self, fn: str, series: dict[str, typing.Any]):
+        os.makedirs(os.path.dirname(fn) or ".", exist_ok=True)
+        with open(fn, "w") as f:
+            f.write(dumps_series(series))
+
+    def iter_series(self) -> typing.Iterator[tuple[str, dict[str, typing.Any]]]:
+        for directory in SERIES_DIRECTORIES:
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".json"):
+                    continue
+                fn = os.path.join(directory, name)
+                series = self.load(fn)
+                if isinstance(series, dict) and "events" in series:
+                    yield _key(fn), series
+
+    @contextlib.contextmanager
+    def transaction(self):
+        yield
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    path TEXT PRIMARY KEY,
+    -- The series with "events" set to null, to keep its key order.
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS venues (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    venue TEXT NOT NULL,
+    address TEXT,
+    lat REAL,
+    lng REAL
+);
+CREATE INDEX IF NOT EXISTS venues_lat_lng ON venues (lat, lng);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    series_path TEXT NOT NULL REFERENCES series (path) ON DELETE CASCADE,
+    -- Counted from the oldest event, so adding a new event doesn't renumber the rest.
+    position INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    venue_id INTEGER REFERENCES venues (id),
+    doc TEXT NOT NULL,
+    UNIQUE (series_path, position)
+);
+CREATE INDEX IF NOT EXISTS events_event_id ON events (event_id);
+CREATE INDEX IF NOT EXISTS events_start_date ON events (start_date);
+CREATE INDEX IF NOT EXISTS events_venue_id ON events (venue_id);
+
+CREATE TABLE IF NOT EXISTS sources (
+    event_id INTEGER NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_event_id ON sources (event_id);
+CREATE INDEX IF NOT EXISTS sources_source ON sources (source);
+"""
+
+
+class SQLiteStorage:
+    """Series stored in indexed SQLite tables.
+
+    Paths are kept relative to the working directory, so the same importer
+    invocations work against either backend, and export() writes back the exact files
+    JSONStorage would have.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Groups writes into one transaction. Nested calls join the outer one."""
+        if self._depth == 0:
+            self.conn.execute("BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield
+        except:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("ROLLBACK")
+            raise
+        else:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("COMMIT")
+
+    def listdir(self, directory: str) -> set[str]:
+        directory = _key(directory)
+        return {
+            os.path.basename(path)
+            for (path,) in self.conn.execute("SELECT path FROM series")
+            if os.path.dirname(path) == ("" if directory == "." else directory)
+        }
+
+    def paths(self) -> list[str]:
+        return [
+            path
+            for (path,) in self.conn.execute("SELECT path FROM series ORDER BY path")
+        ]
+
+    def load(self, fn: str) -> dict[str, typing.Any]:
+        row = self.conn.execute(
+            "SELECT doc FROM series WHERE path = ?", (_key(fn),)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(fn)
+        (doc,) = row
+
+        series = json.loads(doc)
+        series["events"] = [
+            json.loads(event_doc)
+            for (event_doc,) in self.conn.execute(
+                "SELECT doc FROM events WHERE series_path = ? ORDER BY position DESC",
+                (_key(fn),),
+            )
+        ]
+        return series
+
+    def _venue_id(self, event: dict[str, typing.Any]) -> int | None:
+        if "venue" not in event:
+            return None
+        lat, lng = event.get("latLng") or (None, None)
+        key = json.dumps([event["venue"], event.get("address"), lat, lng])
+        self.conn.execute(
+            "INSERT INTO venues (key, venue, address, lat, lng) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (key) DO NOTHING",
+            (key, event["venue"], event.get("address"), lat, lng),
+        )
+        (venue_id,) = self.conn.execute(
+            "SELECT id FROM venues WHERE key = ?", (key,)
+        ).fetchone()
+        return venue_id
+
+    def save(self, fn: str, series: dict[str, typing.Any]):
+        path = _key(fn)
+        events = series["events"]
+
+        with self.transaction():
+            self.conn.execute(
+                "INSERT INTO series (path, doc) VALUES (?, ?)"
+                " ON CONFLICT (path) DO UPDATE SET doc = excluded.doc",
+                (path, json.dumps({**series, "events": None}, ensure_ascii=False)),
+            )
+
+            existing = dict(
+                self.conn.execute(
+                    "SELECT position, doc FROM events WHERE series_path = ?", (path,)
+                )
+            )
+
+            # Only rewrite the events that actually changed.
+            for position, event in enumerate(reversed(events)):
+                doc = json.dumps(event, ensure_ascii=False)
+                if existing.get(position) == doc:
+                    continue
+
+                self.conn.execute(
+                    "DELETE FROM events WHERE series_path = ? AND position = ?",
+                    (path, position),
+                )
+                cursor = self.conn.execute(
+                    "INSERT INTO events"
+                    " (series_path, position, event_id, start_date, end_date,"
+                    " venue_id, doc)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        path,
+                        position,
+                        event["id"],
+                        event["startDate"],
+                        event["endDate"],
+                        self._venue_id(event),
+                        doc,
+                    ),
+                )
+                self.conn.executemany(
+                    "INSERT INTO sources (event_id, source) VALUES (?, ?)",
+                    [(cursor.lastrowid, source) for source in event.get("sources", [])],
+                )
+
+            self.conn.execute(
+                "DELETE FROM events WHERE series_path = ? AND position >= ?",
+                (path, len(events)),
+            )
+
+    def iter_series(self) -> typing.Iterator[tuple[str, dict[str, typing.Any]]]:
+        for path in self.paths():
+            yield path, self.load(path)
+
+    def upcoming(self, days: int) -> list[tuple[str, dict[str, typing.Any]]]:
+        today = datetime.date.today()
+        return [
+            (path, json.loads(doc))
+            for path, doc in self.conn.execute(
+                "SELECT series_path, doc FROM events"
+                " WHERE start_date BETWEEN ? AND ? ORDER BY start_date",
+                (
+                    today.isoformat(),
+                    (today + datetime.timedelta(days=days)).isoformat(),
+                ),
+            )
+        ]
+
+
+def connect() -> JSONStorage | SQLiteStorage:
+    """Returns the SQLite backend if SERIES_DB is set, otherwise JSON files."""
+    if SERIES_DB is not None:
+        return SQLiteStorage(SERIES_DB)
+    return JSONStorage()
+
+
+def import_json(db: SQLiteStorage, directory: str):
+    with db.transaction():
+        for subdirectory in SERIES_DIRECTORIES:
+            if not os.path.isdir(os.path.join(directory, subdirectory)):
+                continue
+            for name in sorted(os.listdir(os.path.join(directory, subdirectory))):
+                if not name.endswith(".json"):
+                    continue
+                with open(os.path.join(directory, subdirectory, name), "r") as f:
+                    raw = f.read()
+                series = json.loads(raw)
+                if not isinstance(series, dict) or "events" not in series:
+                    continue
+                if dumps_series(series) != raw:
+                    logging.warning(
+                        f"{name} is not formatted like the importers write it, "
+                        "export will not reproduce it exactly"
+                    )
+                db.save(os.path.join(subdirectory, name), series)
+
+
+def export_json(db: SQLiteStorage, directory: str):
+    for path in db.paths():
+        fn = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(fn) or ".", exist_ok=True)
+        with open(fn, "w") as f:
+            f.write(dumps_series(db.load(path)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move series data between JSON files and a SQLite database."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import", help="load series JSON files into the database"
+    )
+    import_parser.add_argument("db")
+    import_parser.add_argument("directory", nargs="?", default=".")
+
+    export_parser = subparsers.add_parser(
+        "export", help="write the database back out as series JSON files"
+    )
+    export_parser.add_argument("db")
+    export_parser.add_argument("directory", nargs="?", default=".")
+
+    upcoming_parser = subparsers.add_parser(
+        "upcoming", help="list events starting in the next few days"
+    )
+    upcoming_parser.add_argument("db")
+    upcoming_parser.add_argument("days", type=int, nargs="?", default=90)
+
+    args = parser.parse_args()
+    db = SQLiteStorage(args.db)
+
+    match args.command:
+        case "import":
+            import_json(db, args.directory)
+        case "export":
+            export_json(db, args.directory)
+        case "upcoming":
+            for path, event in db.upcoming(args.days):
+                print(f"{event['startDate']}\t{event['id']}\t{event['name']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import collections
+import difflib
+import functools
+import math
+import typing
+import unicodedata
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def distance_km(a: tuple[float, float], b: tuple[float, float]) -> float:
+    """Great-circle distance between two (lat, lng) points."""
+    lat1, lng1 = map(math.radians, a)
+    lat2, lng2 = map(math.radians, b)
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+# Venue names repeat across a series' events.
+@functools.lru_cache(maxsize=65536)
+def normalize_name(name: str) -> str:
+    return " ".join(
+        "".join(
+            c if unicodedata.category(c)[0] in {"L", "N"} else " "
+            for c in unicodedata.normalize("NFKC", name).casefold()
+        ).split()
+    )
+
+
+def _similar_words(a: str, b: str) -> bool:
+    return a == b or difflib.SequenceMatcher(None, a, b).ratio() >= 0.8
+
+
+def similar_names(a: str, b: str, place: str = "") -> bool:
+    """Whether two venue names plausibly refer to the same place.
+
+    Tolerates case, punctuation and small spelling differences within words, and one
+    name being the other plus words from place, e.g. its city. Any other difference
+    in wording means a different venue, since nearby hotels often share most of a
+    name:
+
+    >>> similar_names("Hyatt Regency", "Hyatt Regency Dallas", "Dallas, TX, US")
+    True
+    >>> similar_names("Hyatt Regency Dalas", "hyatt regency dallas")
+    True
+    >>> similar_names("Hyatt Regency", "Hyatt Regency Dallas")
+    False
+    >>> similar_names("Hilton", "Hilton Garden Inn")
+    False
+    >>> similar_names("Marriott", "Courtyard by Marriott")
+    False
+    >>> similar_names("Holiday Inn", "Holiday Inn Express", "Dallas, TX, US")
+    False
+    >>> similar_names("Hampton Inn", "Hampton Inn & Suites", "Dallas, TX, US")
+    False
+    >>> similar_names("Sheraton Downtown", "Sheraton Uptown")
+    False
+    """
+    a_words = normalize_name(a).split()
+    b_words = normalize_name(b).split()
+    if not a_words or not b_words:
+        return False
+    if "".join(a_words) == "".join(b_words):
+        return True
+
+    if len(a_words) == len(b_words):
+        return all(map(_similar_words, a_words, b_words))
+
+    shorter, longer = sorted([a_words, b_words], key=len)
+    place_words = set(normalize_name(place).split())
+    for i in range(len(longer) - len(shorter) + 1):
+        if longer[i : i + len(shorter)] == shorter and all(
+            word in place_words for word in longer[:i] + longer[i + len(shorter) :]
+        ):
+            return True
+    return False
+
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+CELL_DEGREES = 0.25
+LNG_CELLS = round(360 / CELL_DEGREES)
+
+
+def cell(lat_lng: tuple[float, float]) -> tuple[int, int]:
+    """The grid cell a point falls in."""
+    lat, lng = lat_lng
+    return (
+        math.floor(lat / CELL_DEGREES),
+        math.floor(((lng + 180) % 360) / CELL_DEGREES),
+    )
+
+
+def cells_near(
+    lat_lng: tuple[float, float], radius_km: float
+) -> typing.Iterator[tuple[int, int]]:
+    """Every grid cell that could contain points within radius_km of lat_lng."""
+    lat, lng = lat_lng
+    lat_span = radius_km / KM_PER_DEGREE
+    # Degrees of longitude get shorter towards the poles.
+    max_abs_lat = min(90.0, abs(lat) + lat_span)
+    lng_span = radius_km / (
+        KM_PER_DEGREE * max(math.cos(math.radians(max_abs_lat)), 1e-9)
+    )
+
+    lat_cells = range(
+        math.floor((lat - lat_span) / CELL_DEGREES),
+        math.floor((lat + lat_span) / CELL_DEGREES) + 1,
+    )
+    if lng_span >= 180:
+        lng_cells = range(LNG_CELLS)
+    else:
+        _, lng_cell = cell(lat_lng)
+        reach = math.ceil(lng_span / CELL_DEGREES)
+        lng_cells = {(lng_cell + i) % LNG_CELLS for i in range(-reach, reach + 1)}
+
+    for lat_cell in lat_cells:
+        for lng_cell in lng_cells:
+            yield lat_cell, lng_cell
+
+
+def venue_of(event: dict[str, typing.Any]) -> dict[str, typing.Any] | None:
+    """The event's venue details, if it has a located venue."""
+    if not event.get("venue") or not event.get("latLng"):
+        return None
+
+    return {
+        "venue": event["venue"],
+        "address": event.get("address"),
+        "locale": event.get("locale"),
+        "latLng": event["latLng"],
+        "translations": {
+            language: {
+                k: v for k, v in translation.items() if k in {"venue", "address"}
+            }
+            for language, translation in event.get("translations", {}).items()
+            if "venue" in translation
+        },
+    }
+
+
+def _has_similar_name(venue: dict[str, typing.Any], name: str, place: str = "") -> bool:
+    # The name being looked up may not be in the venue's own language.
+    return any(
+        similar_names(name, venue_name, place)
+        for venue_name in [
+            venue["venue"],
+            *(t["venue"] for t in venue["translations"].values()),
+        ]
+    )
+
+
+def find_by_name(
+    events: typing.Iterable[dict[str, typing.Any]], name: str, place: str = ""
+) -> dict[str, typing.Any] | None:
+    """The venue of the first of events held at a venue similarly named to name."""
+    for event in events:
+        venue = venue_of(event)
+        if venue is not None and _has_similar_name(venue, name, place):
+            return venue
+    return None
+
+
+class VenueIndex:
+    """Venues from existing events, bucketed by grid cell for nearest-venue lookups."""
+
+    def __init__(self):
+        self._cells = collections.defaultdict(dict)
+
+    def add(self, event: dict[str, typing.Any]):
+        """Records the event's venue, unless an identical one is already known."""
+        venue = venue_of(event)
+        if venue is None:
+            return
+
+        lat, lng = venue["latLng"]
+        key = (venue["venue"], venue["address"], lat, lng)
+        self._cells[cell(venue["latLng"])].setdefault(key, venue)
+
+    def find(
+        self,
+        lat_lng: tuple[float, float],
+        name: str,
+        radius_km: float,
+        place: str = "",
+    ) -> dict[str, typing.Any] | None:
+        """The nearest known venue within radius_km whose name is similar to name.
+
+        Translated venue names are considered too. place is passed on to
+        similar_names().
+        """
+        nearest = None
+        nearest_distance = radius_km
+        for c in cells_near(lat_lng, radius_km):
+            for venue in self._cells.get(c, {}).values():
+                distance = distance_km(lat_lng, venue["latLng"])
+                if distance > nearest_distance:
+                    continue
+                if not _has_similar_name(venue, name, place):
+                    continue
+                nearest = venue
+                nearest_distance = distance
+        return nearest